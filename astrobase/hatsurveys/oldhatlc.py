@@ -9,10 +9,17 @@ curves of confirmed transiting planets found by HATNet and HATSouth
 respectively. At some point in the future, these will be reissued as new format
 light curves (readable by hatlc.py).
 
-There is only one function in this module:
+The functions in this module are:
 
 read_hatlc(hatlc) --> Read a retrieved HAT LC into a dict
 
+read_hatlcs(hatlcs) --> Read many retrieved HAT LCs in parallel
+
+flag_as_char(flags) --> Convert a flag column to single-character strings
+
+The single-character flag columns (IQ1, IRQ1, FLT, etc.) are returned as uint8
+character codes, e.g. ord('G') for a good point.
+
 See http://hatsouth.org/planets/lightcurves.html#lightcurve-schema for the light
 curve format description.
 
@@ -20,12 +27,57 @@ curve format description.
 # put this in here because oldhatlc can be used as a standalone module
 __version__ = '0.3.10'
 
+import os
 import os.path
-import gzip
+import io
+import json
+import mmap
+import re
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
 import bz2
 
+# these are Python 3 only, so fall back to their nearest Python 2 equivalents
+try:
+    from shutil import which
+except ImportError:
+    from distutils.spawn import find_executable as which
+
+try:
+    from subprocess import DEVNULL
+except ImportError:
+    DEVNULL = open(os.devnull, 'wb')
+
+try:
+    from types import MappingProxyType
+except ImportError:
+    MappingProxyType = dict
+
+try:
+    from os import replace
+except ImportError:
+    from os import rename as replace
+
+try:
+    from os import fspath
+except ImportError:
+    def fspath(path):
+        return path
+
 import numpy as np
 
+# use the ISA-L gzip module if it's available since it decompresses several
+# times faster than the zlib-based one in the standard library
+HAVEISAL = False
+try:
+
+    from isal import igzip as gzip
+    HAVEISAL = True
+
+except Exception as e:
+    import gzip
+    HAVEISAL = False
+
 HAVEPYFITS = False
 try:
 
@@ -42,6 +94,27 @@ finally:
               "won't be able to read FITS format HAT LCs")
         HAVEPYFITS = False
 
+# numba is optional; without it, text LCs are parsed with np.loadtxt
+HAVENUMBA = False
+try:
+
+    from numba import njit
+    HAVENUMBA = True
+
+except Exception as e:
+    HAVENUMBA = False
+
+# pyarrow is optional; it's used to cache parsed LCs as Feather files
+HAVEPYARROW = False
+try:
+
+    import pyarrow
+    import pyarrow.feather
+    HAVEPYARROW = True
+
+except Exception as e:
+    HAVEPYARROW = False
+
 #########################
 ## SETTINGS AND CONFIG ##
 #########################
@@ -177,6 +250,631 @@ TEXTLC_OUTPUT_COLUMNS = {
            '%12.5f','D',float],
     }
 
+# read-only per-field views of the column definitions above
+COL_DESCRIPTION = MappingProxyType(
+    {k:v[0] for k,v in TEXTLC_OUTPUT_COLUMNS.items()}
+)
+COL_FORMAT = MappingProxyType(
+    {k:v[1] for k,v in TEXTLC_OUTPUT_COLUMNS.items()}
+)
+COL_FITS_TYPE = MappingProxyType(
+    {k:v[2] for k,v in TEXTLC_OUTPUT_COLUMNS.items()}
+)
+COL_CASTER = MappingProxyType(
+    {k:v[3] for k,v in TEXTLC_OUTPUT_COLUMNS.items()}
+)
+
+# buffer size used when reading compressed LCs
+READ_BUFFER_SIZE = 128*1024
+
+# external decompressors. if these are available, compressed text LCs are
+# decompressed in a separate process that runs alongside the parser
+ZCAT = which('zcat')
+BZCAT = which('bzcat')
+
+# seconds to wait for a decompressor process to exit after we're done with it
+DECOMPRESS_TIMEOUT = 10.0
+
+# this parses the object info lines at the top of the text LC header, e.g.:
+# RA = 12.34567 deg, Dec = -23.45678 deg
+# V = 12.100, R = 11.900, I = 11.700, J = 11.000, H = 10.800, K = 10.700
+# Number of detections: 1234
+# HAT stations: 5, 6, 8
+TEXTLC_HEADER_RE = re.compile(
+    r'[^=\n]*= (?P<ra>[^,\s]+)(?: deg)?, '
+    r'[^=\n]*= (?P<dec>[^,\s]+)(?: deg)?\n'
+    r'[^=\n]*= (?P<vmag>[^,\s]+), '
+    r'[^=\n]*= (?P<rmag>[^,\s]+), '
+    r'[^=\n]*= (?P<imag>[^,\s]+), '
+    r'[^=\n]*= (?P<jmag>[^,\s]+), '
+    r'[^=\n]*= (?P<hmag>[^,\s]+), '
+    r'[^=\n]*= (?P<kmag>[^,\s]+)\n'
+    r'[^:\n]*: (?P<ndet>\d+)\n'
+    r'[^:\n]*: (?P<hatstations>.*)'
+)
+
+# version of the Feather cache layout written by _write_feathercache. bump this
+# whenever the cached columns or their output conventions change (e.g. flag
+# columns switching from strings to uint8 codes) so old caches get ignored
+FEATHERCACHE_VERSION = 1
+
+# uncompressed text LCs larger than this are memory-mapped instead of read in
+MMAP_MIN_SIZE = 16*1024*1024
+
+# max number of characters kept for string columns in text LCs
+TEXTLC_STRWIDTH = 16
+
+# numpy dtypes used when reading the text LC columns above
+TEXTLC_NUMPY_DTYPES = {
+    float:'f8',
+    int:'i8',
+    str:'U%s' % TEXTLC_STRWIDTH,
+}
+
+
+# column kinds and record dtypes of the text LC column layouts seen so far
+_TEXTLC_COLUMN_TYPES = {}
+
+
+def _textlc_column_types(columns):
+    '''
+    This returns the column kinds and the numpy record dtype for a text LC
+    with the given tuple of column names.
+
+    The column kinds are the ones understood by parse_hatlc_bytes: 0 for
+    float, 1 for int, 2 for string, and 3 for single-character flag columns
+    (FITS type 1A), which are returned as uint8 character codes.
+
+    Most LCs share the same handful of column layouts, so these are cached.
+
+    '''
+
+    if columns in _TEXTLC_COLUMN_TYPES:
+        return _TEXTLC_COLUMN_TYPES[columns]
+
+    colkinds = []
+    coldtypes = []
+
+    for col in columns:
+
+        if COL_FITS_TYPE[col] == '1A':
+            colkinds.append(3)
+            coldtypes.append('S1')
+        else:
+            colkinds.append((float, int, str).index(COL_CASTER[col]))
+            coldtypes.append(TEXTLC_NUMPY_DTYPES[COL_CASTER[col]])
+
+    lcdtype = np.dtype(list(zip(columns, coldtypes)))
+
+    _TEXTLC_COLUMN_TYPES[columns] = tuple(colkinds), lcdtype
+
+    return _TEXTLC_COLUMN_TYPES[columns]
+
+
+
+def _open_textlc(hatlc, compression, inprocess=False):
+    '''
+    This opens a text LC for reading in binary mode.
+
+    gzipped LCs are read with ISA-L's igzip if it's installed. Otherwise,
+    compressed LCs are piped through zcat or bzcat if they're available, and
+    the Python gzip and bz2 modules are used as a last resort. The Python
+    decompressors are wrapped in a larger buffer so they refill in big chunks
+    instead of many small reads.
+
+    compression is one of '.gz', '.bz2', or None, as returned by _lc_format.
+
+    If inprocess is True, the Python decompressors are always used.
+
+    Returns a tuple of the open file object and the decompressor process (or
+    None if there isn't one). Use _close_textlc to close these.
+
+    '''
+
+    if compression == '.gz' and (HAVEISAL or not ZCAT or inprocess):
+        lcf = io.BufferedReader(gzip.open(hatlc,'rb'),
+                                buffer_size=READ_BUFFER_SIZE)
+        return lcf, None
+
+    elif compression == '.gz':
+        return _pipe_textlc(ZCAT, hatlc)
+
+    elif compression == '.bz2' and BZCAT and not inprocess:
+        return _pipe_textlc(BZCAT, hatlc)
+
+    elif compression == '.bz2':
+
+        bzf = bz2.BZ2File(hatlc, 'rb')
+
+        # Python 2's BZ2File isn't an io object, so it can't be buffered
+        # like this. decompress it into memory instead
+        if not isinstance(bzf, io.IOBase):
+            with bzf:
+                bzf = io.BytesIO(bzf.read())
+
+        lcf = io.BufferedReader(bzf, buffer_size=READ_BUFFER_SIZE)
+        return lcf, None
+
+    else:
+        return io.open(hatlc,'rb'), None
+
+
+
+def _pipe_textlc(decompressor, hatlc):
+    '''
+    This starts a decompressor process (e.g. zcat) for hatlc.
+
+    Returns a tuple of the file object to read the decompressed LC from and
+    the decompressor process.
+
+    '''
+
+    lcproc = subprocess.Popen([decompressor, hatlc],
+                              stdout=subprocess.PIPE,
+                              stderr=DEVNULL,
+                              bufsize=READ_BUFFER_SIZE)
+
+    # Python 2 gives us a plain file object without peek(), so read the pipe
+    # through an io object instead
+    if hasattr(lcproc.stdout, 'peek'):
+        lcf = lcproc.stdout
+    else:
+        lcf = io.open(lcproc.stdout.fileno(), 'rb',
+                      buffering=READ_BUFFER_SIZE,
+                      closefd=False)
+
+    return lcf, lcproc
+
+
+
+def _close_textlc(lcf, lcproc):
+    '''
+    This closes a text LC opened by _open_textlc.
+
+    If there's a decompressor process, it's waited on so it doesn't linger
+    after we're done. Closing its pipe early makes it exit on its next write,
+    but it's killed if it still hasn't exited after DECOMPRESS_TIMEOUT seconds.
+
+    Returns the exit code of the decompressor process, or 0 if there isn't one.
+
+    '''
+
+    lcf.close()
+
+    if lcproc is None:
+        return 0
+
+    lcproc.stdout.close()
+
+    # Python 2's Popen.wait doesn't take a timeout
+    if not hasattr(subprocess, 'TimeoutExpired'):
+        return lcproc.wait()
+
+    try:
+        return lcproc.wait(timeout=DECOMPRESS_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        lcproc.kill()
+        return lcproc.wait()
+
+
+
+def _read_textlc_header(lcf):
+    '''
+    This reads the header from the start of a text LC opened in binary mode.
+
+    Reading stops at the first data row, which is left unread in lcf. Only the
+    header lines are decoded.
+
+    Returns a list of the non-empty header lines with the leading # removed.
+
+    '''
+
+    header = []
+
+    while True:
+
+        nextchar = lcf.peek(1)[:1]
+
+        if nextchar == b'#':
+            line = lcf.readline().rstrip(b'\r\n').strip(b'#').strip()
+            if len(line) > 0:
+                header.append(line.decode('ascii'))
+
+        # skip blank lines before the first data row
+        elif nextchar == b'\n' or nextchar == b'\r':
+            lcf.readline()
+
+        else:
+            break
+
+    return header
+
+
+
+##############################
+## JIT-COMPILED TEXT PARSER ##
+##############################
+
+if HAVENUMBA:
+
+    # exact powers of ten for the float parser below
+    _POW10 = np.array([10.0**x for x in range(23)])
+
+    # lower-case spelling of infinity for the float parser below
+    _INFINITY = np.frombuffer(b'infinity', dtype=np.uint8)
+
+    @njit(cache=True)
+    def _atof(buf, start, end):
+        '''
+        This parses the ASCII bytes buf[start:end] into a float.
+
+        This only handles values that can be converted exactly with one
+        floating point multiply or divide: a mantissa of at most 2^53 and a
+        decimal exponent within +/-22 (this covers all the formats in
+        TEXTLC_OUTPUT_COLUMNS). The result is then exactly what float() would
+        produce. Anything else is reported as a failure, so the caller can
+        fall back to a correctly rounded parser.
+
+        Returns a tuple of (value, ok), where ok is False if the field
+        couldn't be converted. This doesn't raise exceptions, since numba
+        leaks references to the arrays passed in when a compiled function
+        raises (and these can be views of a memory-mapped file).
+
+        '''
+
+        i = start
+        negative = False
+
+        if i < end and (buf[i] == 45 or buf[i] == 43):
+            negative = buf[i] == 45
+            i += 1
+
+        # nan and inf
+        nleft = end - i
+        if (nleft == 3 and
+            (buf[i] | 32) == 110 and
+            (buf[i+1] | 32) == 97 and
+            (buf[i+2] | 32) == 110):
+            return np.nan, True
+        if nleft == 3 or nleft == 8:
+            isinf = True
+            for j in range(nleft):
+                if (buf[i+j] | 32) != _INFINITY[j]:
+                    isinf = False
+                    break
+            if isinf:
+                return (-np.inf if negative else np.inf), True
+
+        mantissa = 0
+        ndigits = 0
+        nsigdigits = 0
+        exponent = 0
+        infraction = False
+
+        while i < end:
+
+            c = buf[i]
+
+            if c >= 48 and c <= 57:
+
+                ndigits += 1
+
+                if nsigdigits < 18:
+                    mantissa = mantissa*10 + (c - 48)
+                    if mantissa > 0:
+                        nsigdigits += 1
+                    if infraction:
+                        exponent -= 1
+                elif not infraction:
+                    exponent += 1
+
+            elif c == 46 and not infraction:
+                infraction = True
+            else:
+                break
+
+            i += 1
+
+        if ndigits == 0:
+            return 0.0, False
+
+        # the exponent part
+        if i < end and (buf[i] | 32) == 101:
+
+            i += 1
+            expnegative = False
+            expvalue = 0
+            nexpdigits = 0
+
+            if i < end and (buf[i] == 45 or buf[i] == 43):
+                expnegative = buf[i] == 45
+                i += 1
+
+            while i < end and buf[i] >= 48 and buf[i] <= 57:
+                expvalue = expvalue*10 + (buf[i] - 48)
+                nexpdigits += 1
+                i += 1
+
+            if nexpdigits == 0:
+                return 0.0, False
+
+            if expnegative:
+                exponent -= expvalue
+            else:
+                exponent += expvalue
+
+        if i != end:
+            return 0.0, False
+
+        if mantissa == 0:
+            return (-0.0 if negative else 0.0), True
+
+        if mantissa > 9007199254740992 or exponent > 22 or exponent < -22:
+            return 0.0, False
+
+        value = float(mantissa)
+
+        if exponent > 0:
+            value *= _POW10[exponent]
+        elif exponent < 0:
+            value /= _POW10[-exponent]
+
+        return (-value if negative else value), True
+
+
+    @njit(cache=True)
+    def _atoi(buf, start, end):
+        '''
+        This parses the ASCII bytes buf[start:end] into an int.
+
+        Returns a tuple of (value, ok), where ok is False if the field
+        couldn't be converted. Fields with more than 18 digits are also
+        refused, since they might overflow an int64.
+
+        '''
+
+        i = start
+        negative = False
+
+        if i < end and (buf[i] == 45 or buf[i] == 43):
+            negative = buf[i] == 45
+            i += 1
+
+        if i == end or end - i > 18:
+            return 0, False
+
+        value = 0
+
+        while i < end:
+            c = buf[i]
+            if c < 48 or c > 57:
+                return 0, False
+            value = value*10 + (c - 48)
+            i += 1
+
+        return (-value if negative else value), True
+
+
+    @njit(cache=True)
+    def _count_lines(buf):
+        '''
+        This returns the number of lines in buf, counting a last line without
+        a trailing newline.
+
+        '''
+
+        nlines = 1
+        for i in range(buf.size):
+            if buf[i] == 10:
+                nlines += 1
+
+        return nlines
+
+
+    @njit(cache=True)
+    def parse_hatlc_bytes(buf,
+                          colkinds,
+                          colslots,
+                          delimiter,
+                          floats,
+                          ints,
+                          strs,
+                          flags):
+        '''
+        This parses the data rows of a text HAT LC in a single pass.
+
+        buf is a uint8 array of the raw file contents. Lines starting with #
+        and blank lines are skipped. delimiter is the ASCII code of the column
+        separator, or 0 to split on runs of whitespace.
+
+        colkinds gives the kind of each column: 0 for float, 1 for int, 2 for
+        string, and 3 for single-character flags. colslots gives the index of
+        each column among the columns of its kind.
+
+        The values are written in place into the preallocated output arrays,
+        which are laid out column by column so each column is contiguous:
+        floats is a float64 array of shape (nfloatcols, maxrows), ints is an
+        int64 array of shape (nintcols, maxrows), and strs is a zero-filled
+        uint32 array of shape (nstrcols, maxrows, strwidth), which gets the
+        characters of the string columns as code points, and flags is a
+        zero-filled uint8 array of shape (nflagcols, maxrows), which gets the
+        character codes of the flag columns. maxrows must be at least the
+        number of lines in buf (see _count_lines).
+
+        Returns the number of rows read. If a row can't be parsed, returns
+        -1 - (the index of the bad row) instead.
+
+        '''
+
+        nbuf = buf.size
+        ncols = colkinds.size
+        strwidth = strs.shape[2]
+
+        nrows = 0
+        pos = 0
+
+        while pos < nbuf:
+
+            eol = pos
+            while eol < nbuf and buf[eol] != 10:
+                eol += 1
+
+            lineend = eol
+            if lineend > pos and buf[lineend-1] == 13:
+                lineend -= 1
+
+            # skip comment lines
+            if lineend == pos or buf[pos] == 35:
+                pos = eol + 1
+                continue
+
+            # skip blank lines
+            blank = True
+            for i in range(pos, lineend):
+                if buf[i] != 32 and buf[i] != 9:
+                    blank = False
+                    break
+            if blank:
+                pos = eol + 1
+                continue
+
+            col = 0
+            fieldpos = pos
+
+            while True:
+
+                if delimiter == 0:
+                    while (fieldpos < lineend and
+                           (buf[fieldpos] == 32 or buf[fieldpos] == 9)):
+                        fieldpos += 1
+                    if fieldpos >= lineend:
+                        break
+                    fieldend = fieldpos
+                    while (fieldend < lineend and
+                           buf[fieldend] != 32 and buf[fieldend] != 9):
+                        fieldend += 1
+                else:
+                    fieldend = fieldpos
+                    while fieldend < lineend and buf[fieldend] != delimiter:
+                        fieldend += 1
+
+                # too many columns
+                if col >= ncols:
+                    return -1 - nrows
+
+                start, end = fieldpos, fieldend
+                while start < end and (buf[start] == 32 or buf[start] == 9):
+                    start += 1
+                while end > start and (buf[end-1] == 32 or buf[end-1] == 9):
+                    end -= 1
+
+                kind = colkinds[col]
+                slot = colslots[col]
+
+                if kind == 0:
+                    fvalue, ok = _atof(buf, start, end)
+                    if not ok:
+                        return -1 - nrows
+                    floats[slot, nrows] = fvalue
+                elif kind == 1:
+                    ivalue, ok = _atoi(buf, start, end)
+                    if not ok:
+                        return -1 - nrows
+                    ints[slot, nrows] = ivalue
+                elif kind == 2:
+                    for i in range(min(end - start, strwidth)):
+                        strs[slot, nrows, i] = buf[start + i]
+                elif end > start:
+                    flags[slot, nrows] = buf[start]
+
+                col += 1
+
+                if delimiter != 0 and fieldend >= lineend:
+                    break
+
+                fieldpos = fieldend + 1
+
+            # too few columns
+            if col != ncols:
+                return -1 - nrows
+
+            nrows += 1
+            pos = eol + 1
+
+        return nrows
+
+
+
+def _read_textlc_columns(lcbytes, columns, colkinds, delimiter):
+    '''
+    This parses the data rows of a text LC using parse_hatlc_bytes.
+
+    colkinds is the list of kinds for each column in columns, as returned by
+    _textlc_column_types.
+
+    Returns a dict of column arrays.
+
+    '''
+
+    # work out where each column goes in the output arrays for its kind
+    colkinds = np.array(colkinds, dtype=np.int64)
+    colslots = np.zeros(len(columns), dtype=np.int64)
+    nkind = [0, 0, 0, 0]
+
+    for ind, kind in enumerate(colkinds):
+        colslots[ind] = nkind[kind]
+        nkind[kind] += 1
+
+    buf = np.frombuffer(lcbytes, dtype=np.uint8)
+
+    # buf holds an export of lcbytes. make sure it's gone before we return or
+    # raise, so the caller can release lcbytes (e.g. to close an mmap)
+    try:
+
+        # preallocate the outputs in their final dtypes so the parser can
+        # fill them in directly. these are column-major, so each output
+        # column is a contiguous slice. the string columns are stored as UCS4
+        # code points so they can be viewed as numpy unicode arrays without
+        # decoding them
+        maxrows = _count_lines(buf)
+        floats = np.empty((nkind[0], maxrows), dtype=np.float64)
+        ints = np.empty((nkind[1], maxrows), dtype=np.int64)
+        strs = np.zeros((nkind[2], maxrows, TEXTLC_STRWIDTH),
+                        dtype=np.uint32)
+        flags = np.zeros((nkind[3], maxrows), dtype=np.uint8)
+
+        nrows = parse_hatlc_bytes(
+            buf,
+            colkinds,
+            colslots,
+            ord(delimiter) if delimiter else 0,
+            floats,
+            ints,
+            strs,
+            flags
+        )
+
+    finally:
+        del buf
+
+    if nrows < 0:
+        raise ValueError('could not parse data row %s of this LC' %
+                         (-1 - nrows))
+
+    lccols = {}
+
+    for col, kind, slot in zip(columns, colkinds, colslots):
+
+        if kind == 0:
+            lccols[col] = floats[slot,:nrows]
+        elif kind == 1:
+            lccols[col] = ints[slot,:nrows]
+        elif kind == 2:
+            lccols[col] = strs[slot,:nrows].view(TEXTLC_NUMPY_DTYPES[str])[:,0]
+        else:
+            lccols[col] = flags[slot,:nrows]
+
+    return lccols
 
 
 
@@ -184,127 +882,474 @@ TEXTLC_OUTPUT_COLUMNS = {
 ## READING RETRIEVED HATLCS ##
 ##############################
 
-def read_hatlc(hatlc):
+def flag_as_char(flags):
     '''
-    This reads a consolidated HAT LC written by the functions above.
+    This returns a view of a uint8 flag column (e.g. IQ1) from read_hatlc as
+    an array of single-character bytes strings.
+
+    '''
+
+    return np.asarray(flags, dtype=np.uint8).view('S1')
+
+
 
-    Returns a dict.
 
+def _lc_format(hatlc):
     '''
+    This works out the format and compression of an LC from its file name.
 
-    lcfname = os.path.basename(hatlc)
+    Returns a tuple of (format, compression), e.g. ('.csv', '.gz'). The
+    format is one of '.fits', '.csv', or '.hatlc', and the compression is one
+    of '.gz' or '.bz2'. Either is None if it can't be determined.
 
-    # unzip the files first
-    if '.gz' in lcfname:
-        lcf = gzip.open(hatlc,'rb')
-    elif '.bz2' in lcfname:
-        lcf = bz2.BZ2File(hatlc, 'rb')
+    '''
+
+    # these are the same as pathlib's suffixes, e.g. ['.csv', '.gz']
+    lcname = os.path.basename(hatlc).lstrip('.')
+    suffixes = ['.' + x for x in lcname.split('.')[1:]]
+
+    if len(suffixes) > 0 and suffixes[-1] in ('.gz', '.bz2'):
+        compression = suffixes[-1]
     else:
-        lcf = open(hatlc,'rb')
+        compression = None
 
-    if '.fits' in lcfname and HAVEPYFITS:
+    for lcformat in ('.fits', '.csv', '.hatlc'):
+        if lcformat in suffixes:
+            return lcformat, compression
+
+    return None, compression
 
-        hdulist = pyfits.open(lcf)
-        objectinfo = hdulist[0].header
-        objectlc = hdulist[1].data
-        lccols = objectlc.columns.names
-        hdulist.close()
-        lcf.close()
 
-        lcdict = {}
 
-        for col in lccols:
+def _read_fitslc(hatlc, copy=True):
+    '''
+    This reads a FITS HAT LC. See read_hatlc for details.
+
+    '''
+
+    # pyfits handles the decompression of .fits.gz files itself, so we give
+    # it the path instead of an open file object. plain .fits files are only
+    # memory-mapped if we're returning views, since each mapping keeps the
+    # file open for as long as the views are around
+    hdulist = pyfits.open(hatlc, memmap=not copy)
+
+    # copy the header into a plain dict once, since looking up cards in a
+    # FITS header is a linear search. FITS keywords are case-insensitive and
+    # come back in upper case, so we lower-case them here
+    objectinfo = {key.lower():val for key, val in hdulist[0].header.items()}
+
+    objectlc = hdulist[1].data
+    lccols = objectlc.columns.names
+    hdulist.close()
+
+    lcdict = {}
+
+    # unless asked for copies, these are views into the FITS data. the
+    # single-character flag columns are converted to uint8 character codes
+    # like in text LCs
+    for col in lccols:
+        if COL_FITS_TYPE.get(col) == '1A':
+            lcdict[col] = np.asarray(objectlc[col]).astype('S1').view(np.uint8)
+        elif copy:
             lcdict[col] = np.array(objectlc[col])
+        else:
+            lcdict[col] = np.asarray(objectlc[col])
 
-        lcdict['hatid'] = objectinfo['hatid']
-        lcdict['twomassid'] = objectinfo['2massid']
-        lcdict['ra'] = objectinfo['ra']
-        lcdict['dec'] = objectinfo['dec']
-        lcdict['mags'] = [objectinfo[x] for x in ('vmag','rmag','imag',
-                                                  'jmag','hmag','kmag')]
-        lcdict['ndet'] = objectinfo['ndet']
-        lcdict['hatstations'] = objectinfo['hats']
-        lcdict['filters'] = objectinfo['filters']
-        lcdict['columns'] = lccols
+    lcdict['hatid'] = objectinfo['hatid']
+    lcdict['twomassid'] = objectinfo['2massid']
+    lcdict['ra'] = objectinfo['ra']
+    lcdict['dec'] = objectinfo['dec']
+    lcdict['mags'] = [objectinfo[x] for x in ('vmag','rmag','imag',
+                                              'jmag','hmag','kmag')]
+    lcdict['ndet'] = objectinfo['ndet']
+    lcdict['hatstations'] = objectinfo['hats']
+    lcdict['filters'] = objectinfo['filters']
+    lcdict['columns'] = lccols
 
-        return lcdict
+    return lcdict
 
-    elif '.fits' in lcfname and not HAVEPYFITS:
 
-        print("can't read %s since we don't have the pyfits module" % lcfname)
-        return
 
-    elif '.csv' in lcfname or '.hatlc' in lcfname:
+def _strip_textlc_field(field):
+    '''
+    This strips the spaces and tabs around a text LC field for np.loadtxt.
+
+    '''
 
-        lcflines = lcf.read().decode().split('\n') # argh Python 3
-        lcf.close()
+    return field.strip(' \t')
 
-        # now process the read-in LC
-        objectdata = [x for x in lcflines if x.startswith('#')]
-        objectlc = [x for x in lcflines if not x.startswith('#')]
-        objectlc = [x for x in objectlc if len(x) > 1]
 
-        if '.csv' in lcfname:
-            objectlc = [x.split(',') for x in objectlc]
-        else:
-            objectlc = [x.split() for x in objectlc]
 
-        # transpose split rows to get columns
-        objectlc = list(zip(*objectlc)) # argh Python 3
+def _read_textlc_stream(hatlc, lcf, lcformat, compression):
+    '''
+    This reads a .csv or .hatlc text HAT LC from lcf, opened by _open_textlc.
+
+    '''
+
+    # read the header to figure out the object's info and column names.
+    # this leaves the data rows unread in lcf
+    objectdata = _read_textlc_header(lcf)
+
+    if len(objectdata) == 0:
+        raise ValueError("couldn't find a header in %s" % hatlc)
+
+    hatid, twomassid = objectdata[0].split(' - ')
+
+    # the coordinates, magnitudes, ndet, and HAT stations come from the next
+    # four lines of the header
+    objectinfo = TEXTLC_HEADER_RE.match('\n'.join(objectdata[1:5]))
+
+    if not objectinfo:
+        raise ValueError("couldn't parse the object info in the header of %s" %
+                         hatlc)
 
-        # read the header to figure out the object's info and column names
-        objectdata = [x.strip('#') for x in objectdata]
-        objectdata = [x.strip() for x in objectdata]
-        objectdata = [x for x in objectdata if len(x) > 0]
+    (ra, dec,
+     vmag, rmag, imag, jmag, hmag, kmag) = map(float, objectinfo.groups()[:8])
 
-        hatid, twomassid = objectdata[0].split(' - ')
-        ra, dec = objectdata[1].split(', ')
-        ra = float(ra.split(' = ')[-1].strip(' deg'))
-        dec = float(dec.split(' = ')[-1].strip(' deg'))
+    ndet = int(objectinfo.group('ndet'))
+    hatstations = objectinfo.group('hatstations')
 
-        vmag, rmag, imag, jmag, hmag, kmag = objectdata[2].split(', ')
-        vmag = float(vmag.split(' = ')[-1])
-        rmag = float(rmag.split(' = ')[-1])
-        imag = float(imag.split(' = ')[-1])
-        jmag = float(jmag.split(' = ')[-1])
-        hmag = float(hmag.split(' = ')[-1])
-        kmag = float(kmag.split(' = ')[-1])
+    filterhead_ind = objectdata.index('Filters used:')
+    columnhead_ind = objectdata.index('Columns:')
 
-        ndet = int(objectdata[3].split(': ')[-1])
-        hatstations = objectdata[4].split(': ')[-1]
+    filters = objectdata[filterhead_ind:columnhead_ind]
 
-        filterhead_ind = objectdata.index('Filters used:')
-        columnhead_ind = objectdata.index('Columns:')
+    columndefs = objectdata[columnhead_ind+1:]
 
-        filters = objectdata[filterhead_ind:columnhead_ind]
+    # column descriptions may contain ' - ' themselves, so only split off the
+    # column number and name
+    columns = [line.split(' - ', 2)[1] for line in columndefs]
 
-        columndefs = objectdata[columnhead_ind+1:]
+    # look up the type of each column once here, instead of for each
+    # value in the LC
+    colkinds, lcdtype = _textlc_column_types(tuple(columns))
 
-        columns = []
-        for line in columndefs:
+    delimiter = ',' if lcformat == '.csv' else None
+    lcdict = None
 
-            colnum, colname, coldesc = line.split(' - ')
-            columns.append(colname)
+    if HAVENUMBA:
+
+        # the numba parser works on the raw bytes of the whole data block
+        # at once. large uncompressed LCs are memory-mapped so we don't
+        # have to copy them into memory first
+        if (compression is None and
+            os.fstat(lcf.fileno()).st_size > MMAP_MIN_SIZE):
+
+            lcmmap = mmap.mmap(lcf.fileno(), 0, access=mmap.ACCESS_READ)
+            if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                lcmmap.madvise(mmap.MADV_SEQUENTIAL)
+            lcbytes = memoryview(lcmmap)[lcf.tell():]
+
+        else:
+
+            lcmmap = None
+            lcbytes = lcf.read()
+
+        try:
+            lcdict = _read_textlc_columns(lcbytes,
+                                          columns,
+                                          colkinds,
+                                          delimiter)
+        except Exception as e:
+            lcdict = None
+        finally:
+            if lcmmap is not None:
+                lcbytes.release()
+                lcmmap.close()
+
+        # if we need to fall back to np.loadtxt, a memory-mapped LC can
+        # still be read from lcf since we haven't moved past the header
+        if lcmmap is not None:
+            lcrows = io.TextIOWrapper(lcf, encoding='ascii')
+        else:
+            lcrows = io.TextIOWrapper(io.BytesIO(lcbytes),
+                                      encoding='ascii')
+
+    else:
+
+        lcrows = io.TextIOWrapper(lcf, encoding='ascii')
+
+    # fall back to np.loadtxt if numba isn't available or failed
+    if lcdict is None:
+
+        # the record dtype from our existing column definitions lets
+        # numpy do the tokenizing and type conversion for all rows in C. the
+        # string and flag fields are stripped of spaces like in
+        # parse_hatlc_bytes, so padded CSV fields read the same either way
+        objectlc = np.loadtxt(
+            lcrows,
+            dtype=lcdtype,
+            delimiter=delimiter,
+            comments='#',
+            converters={ind:_strip_textlc_field
+                        for ind, kind in enumerate(colkinds) if kind >= 2},
+            encoding='ascii',
+            ndmin=1
+        )
 
         lcdict = {}
 
         # now write all the columns to the output dictionary
-        for ind, col in enumerate(columns):
-
-            # this formats everything nicely using our existing column
-            # definitions
-            lcdict[col] = np.array([TEXTLC_OUTPUT_COLUMNS[col][3](x)
-                                    for x in objectlc[ind]])
-
-        # write the object metadata to the output dictionary
-        lcdict['hatid'] = hatid
-        lcdict['twomassid'] = twomassid.strip('2MASS J')
-        lcdict['ra'] = ra
-        lcdict['dec'] = dec
-        lcdict['mags'] = [vmag, rmag, imag, jmag, hmag, kmag]
-        lcdict['ndet'] = ndet
-        lcdict['hatstations'] = hatstations.split(', ')
-        lcdict['filters'] = filters[1:]
-        lcdict['cols'] = columns
-
-        return lcdict
+        for col, kind in zip(columns, colkinds):
+            if kind == 3:
+                lcdict[col] = objectlc[col].view(np.uint8)
+            else:
+                lcdict[col] = objectlc[col]
+
+    # write the object metadata to the output dictionary
+    lcdict['hatid'] = hatid
+    lcdict['twomassid'] = twomassid.strip('2MASS J')
+    lcdict['ra'] = ra
+    lcdict['dec'] = dec
+    lcdict['mags'] = [vmag, rmag, imag, jmag, hmag, kmag]
+    lcdict['ndet'] = ndet
+    lcdict['hatstations'] = hatstations.split(', ')
+    lcdict['filters'] = filters[1:]
+    lcdict['cols'] = columns
+
+    return lcdict
+
+
+
+def _read_textlc(hatlc, lcformat, compression):
+    '''
+    This reads a .csv or .hatlc text HAT LC. See read_hatlc for details.
+
+    '''
+
+    lcf, lcproc = _open_textlc(hatlc, compression)
+    lcerror = None
+
+    try:
+        lcdict = _read_textlc_stream(hatlc, lcf, lcformat, compression)
+    except Exception as e:
+        if lcproc is None:
+            raise
+        lcerror = e
+    finally:
+        retcode = _close_textlc(lcf, lcproc)
+
+    # if zcat or bzcat failed (e.g. BSD zcat only handles .Z files), whatever
+    # we read from it can't be trusted, so read the LC again using the Python
+    # decompressors
+    if retcode != 0:
+
+        lcf, lcproc = _open_textlc(hatlc, compression, inprocess=True)
+
+        try:
+            lcdict = _read_textlc_stream(hatlc, lcf, lcformat, compression)
+        finally:
+            _close_textlc(lcf, lcproc)
+
+    elif lcerror is not None:
+        raise lcerror
+
+    return lcdict
+
+
+
+def _read_feathercache(hatlc):
+    '''
+    This reads the Feather cache of an LC written by _write_feathercache.
+
+    Returns the LC dict, or None if there's no cache for the LC, the cache is
+    older than the LC, or the cache was written with a different
+    FEATHERCACHE_VERSION.
+
+    '''
+
+    cachefile = hatlc + '.feather'
+    metafile = hatlc + '.feather.json'
+
+    if not (os.path.exists(cachefile) and os.path.exists(metafile)):
+        return None
+
+    lcmtime = os.path.getmtime(hatlc)
+    if (os.path.getmtime(cachefile) < lcmtime or
+        os.path.getmtime(metafile) < lcmtime):
+        return None
+
+    with open(metafile,'r') as infd:
+        cacheinfo = json.load(infd)
+
+    if cacheinfo.get('version') != FEATHERCACHE_VERSION:
+        return None
+
+    lctable = pyarrow.feather.read_table(cachefile)
+
+    lcdict = cacheinfo['metadata']
+
+    # Arrow hands back read-only arrays, so copy these into writable ones
+    for col, coldtype in zip(cacheinfo['columns'], cacheinfo['dtypes']):
+        lcdict[col] = np.array(lctable.column(col).to_numpy(),
+                               dtype=coldtype)
+
+    return lcdict
+
+
+
+def _write_feathercache(hatlc, lcdict):
+    '''
+    This writes the columns of an LC dict to an LZ4-compressed Feather file
+    next to the LC, and the rest of the LC dict to a JSON file alongside it.
+
+    '''
+
+    columns = [x for x in lcdict if isinstance(lcdict[x], np.ndarray)]
+
+    # Arrow only takes native byte order, and FITS columns are big-endian
+    colarrays = [lcdict[x].astype(lcdict[x].dtype.newbyteorder('='),
+                                  copy=False)
+                 for x in columns]
+
+    cachefile = hatlc + '.feather'
+    metafile = hatlc + '.feather.json'
+
+    cacheinfo = {
+        'version':FEATHERCACHE_VERSION,
+        'columns':columns,
+        'dtypes':[x.dtype.str for x in colarrays],
+        'metadata':{key:val for key, val in lcdict.items()
+                    if key not in columns},
+    }
+
+    # write to temporary files and then move them into place, so a reader
+    # never sees a partly written cache
+    cachetemp = '%s.%s.tmp' % (cachefile, os.getpid())
+    metatemp = '%s.%s.tmp' % (metafile, os.getpid())
+
+    try:
+
+        pyarrow.feather.write_feather(
+            pyarrow.table(dict(zip(columns, colarrays))),
+            cachetemp,
+            compression='lz4'
+        )
+
+        with open(metatemp,'w') as outfd:
+            json.dump(cacheinfo, outfd)
+
+        replace(cachetemp, cachefile)
+        replace(metatemp, metafile)
+
+    finally:
+        for tempname in (cachetemp, metatemp):
+            if os.path.exists(tempname):
+                os.remove(tempname)
+
+
+
+def read_hatlc(hatlc, copy=True, feathercache=False):
+    '''
+    This reads a consolidated HAT LC written by the functions above.
+
+    If copy is True (the default), the columns of FITS LCs are returned as
+    separate, contiguous arrays. If copy is False, they're returned as views
+    into the memory-mapped FITS table instead. This avoids copying the
+    columns, but each view keeps the FITS file open and mapped until all the
+    views from that LC are gone, so don't keep the LC dicts from many LCs
+    read this way around at once.
+
+    If feathercache is True and pyarrow is available, the parsed LC is cached
+    in a Feather file (hatlc + '.feather') and a JSON file (hatlc +
+    '.feather.json') next to the LC. Later calls with feathercache=True read
+    the LC from these instead, as long as they're newer than the LC. Columns
+    read from the cache are always separate, writable arrays, whatever the
+    value of copy.
+
+    Returns a dict.
+
+    '''
+
+    hatlc = fspath(hatlc)
+
+    if feathercache and HAVEPYARROW:
+
+        # a cache we can't read is treated like a missing one, so the LC is
+        # read again and the cache is rewritten
+        try:
+            lcdict = _read_feathercache(hatlc)
+        except Exception as e:
+            print("couldn't read the Feather cache for %s: %r" %
+                  (os.path.basename(hatlc), e))
+            lcdict = None
+
+        if lcdict is not None:
+            return lcdict
+
+    lcformat, compression = _lc_format(hatlc)
+
+    if lcformat == '.fits' and HAVEPYFITS:
+
+        lcdict = _read_fitslc(hatlc, copy=copy)
+
+    elif lcformat == '.fits' and not HAVEPYFITS:
+
+        print("can't read %s since we don't have the pyfits module" %
+              os.path.basename(hatlc))
+        return
+
+    elif lcformat == '.csv' or lcformat == '.hatlc':
+
+        lcdict = _read_textlc(hatlc, lcformat, compression)
+
+    else:
+
+        return
+
+    if feathercache and HAVEPYARROW:
+
+        try:
+            _write_feathercache(hatlc, lcdict)
+        except Exception as e:
+            print("couldn't write a Feather cache for %s: %r" %
+                  (os.path.basename(hatlc), e))
+
+    return lcdict
+
+
+
+def read_hatlc_worker(task):
+    '''
+    This is a parallel worker for read_hatlcs.
+
+    task[0] = hatlc
+    task[1] = {'feathercache'}
+
+    Returns the LC dict, or None if the LC couldn't be read.
+
+    '''
+
+    hatlc, kwargs = task
+
+    try:
+        return read_hatlc(hatlc, **kwargs)
+    except Exception as e:
+        print("couldn't read %s: %r" % (os.path.basename(hatlc), e))
+        return None
+
+
+
+def read_hatlcs(hatlcs, nworkers=None, chunksize=16, feathercache=False):
+    '''
+    This reads many HAT LCs in parallel using read_hatlc.
+
+    hatlcs is a list of paths to the LCs. nworkers is the number of worker
+    processes to use; this defaults to the number of CPUs. chunksize is the
+    number of LCs sent to each worker at a time. feathercache is passed on to
+    read_hatlc.
+
+    This is a generator that yields the LC dicts in the same order as hatlcs,
+    or None for each LC that couldn't be read. The dicts are pickled on their
+    way back from the workers, so the columns of FITS LCs arrive as ordinary
+    in-memory arrays, not views into the FITS files.
+
+    '''
+
+    tasks = [(x, {'feathercache':feathercache}) for x in hatlcs]
+
+    with ProcessPoolExecutor(max_workers=nworkers) as executor:
+        for lcdict in executor.map(read_hatlc_worker,
+                                   tasks,
+                                   chunksize=chunksize):
+            yield lcdict
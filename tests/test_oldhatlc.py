@@ -0,0 +1,750 @@
+'''test_oldhatlc.py - Oct 2026
+License: MIT - see the LICENSE file for details.
+
+This tests the following:
+
+- builds small synthetic .csv, .hatlc, and FITS light curves in a temp
+  directory, along with compressed versions of these
+- reads them and their object info using astrobase.hatsurveys.oldhatlc, with
+  and without numba, and using each of the available decompressors
+- reads many of them in parallel, including a missing one
+- checks the numba float and int parsers against float() and int()
+- checks that flag columns are uint8 codes and padded fields are stripped
+- checks the fallback to np.loadtxt for memory-mapped LCs and the Feather cache
+
+'''
+from __future__ import print_function
+
+import bz2
+import gzip
+import io
+import os
+import pathlib
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+
+from astrobase.hatsurveys import oldhatlc
+
+
+############
+## CONFIG ##
+############
+
+# these are the columns written to the test light curves
+LCCOLUMNS = ['RJD', 'STF', 'CFN', 'RSTF', 'FLD', 'FLT',
+             'XCC', 'YCC', 'IM1', 'IE1', 'IQ1', 'TF1']
+
+LCHEADER = '''# HAT-123-0001234 - 2MASS J01234567+0123456
+# RA = 12.34567 deg, Dec = -23.45678 deg
+# V = 12.100, R = 11.900, I = 11.700, J = 11.000, H = 10.800, K = 10.700
+# Number of detections: {ndet}
+# HAT stations: 5, 6, 8
+#
+# Filters used:
+# r - Sloan r
+# Columns:
+'''
+
+
+def make_textlc(lcpath, nrows=200, badrow=None, seed=42, padded=False):
+    '''
+    This writes a synthetic text LC to lcpath. If lcpath ends with .csv, the
+    columns are comma-separated, otherwise they're whitespace-separated.
+
+    If badrow is given, the IM1 value in that row is replaced with garbage. If
+    padded is True, each field is written with spaces around it.
+
+    Returns the dict of column values written to the LC.
+
+    '''
+
+    rng = np.random.RandomState(seed)
+
+    lccols = {
+        'RJD':['%.7f' % x for x in 56000.0 + np.sort(rng.uniform(0,100,nrows))],
+        'STF':['%d' % x for x in rng.randint(5,20,nrows)],
+        'CFN':['%d' % x for x in rng.randint(0,30000,nrows)],
+        'RSTF':['%d-%06d' % (x, y) for x, y in zip(rng.randint(5,20,nrows),
+                                                  rng.randint(0,999999,nrows))],
+        'FLD':['G%03d' % x for x in rng.randint(0,999,nrows)],
+        'FLT':[x for x in rng.choice(list('rRiI'),nrows)],
+        'XCC':['%.1f' % x for x in rng.uniform(0,2048,nrows)],
+        'YCC':['%.1f' % x for x in rng.uniform(0,2048,nrows)],
+        'IM1':['%.5f' % x for x in rng.normal(12.0,0.1,nrows)],
+        'IE1':['%.5f' % x for x in rng.uniform(0.001,0.1,nrows)],
+        'IQ1':[x for x in rng.choice(list('GXC'),nrows)],
+        'TF1':['%.5f' % x for x in rng.normal(12.0,0.1,nrows)],
+    }
+
+    if badrow is not None:
+        lccols['IM1'][badrow] = 'xx051.18'
+
+    delimiter = ',' if lcpath.endswith('.csv') else ' '
+    fieldformat = ' %s ' if padded else '%s'
+
+    lctext = [LCHEADER.format(ndet=nrows)]
+    lctext.extend(
+        '# %s - %s - %s\n' % (ind, col, oldhatlc.COL_DESCRIPTION[col])
+        for ind, col in enumerate(LCCOLUMNS)
+    )
+    lctext.extend(
+        delimiter.join(fieldformat % lccols[col][row]
+                       for col in LCCOLUMNS) + '\n'
+        for row in range(nrows)
+    )
+
+    with open(lcpath,'w') as outfd:
+        outfd.write(''.join(lctext))
+
+    return lccols
+
+
+
+def make_fitslc(lcpath, lccols):
+    '''
+    This writes the columns in lccols (returned by make_textlc) to a FITS LC
+    at lcpath.
+
+    '''
+
+    header = oldhatlc.pyfits.Header()
+    for key, val in (('hatid','HAT-123-0001234'),
+                     ('2massid','01234567+0123456'),
+                     ('ra',12.34567),
+                     ('dec',-23.45678),
+                     ('vmag',12.1),
+                     ('rmag',11.9),
+                     ('imag',11.7),
+                     ('jmag',11.0),
+                     ('hmag',10.8),
+                     ('kmag',10.7),
+                     ('ndet',len(lccols['RJD'])),
+                     ('hats','5, 6, 8'),
+                     ('filters','r')):
+        header[key] = val
+
+    fitscols = []
+    for col in LCCOLUMNS:
+        caster = oldhatlc.COL_CASTER[col]
+        fitscols.append(
+            oldhatlc.pyfits.Column(
+                name=col,
+                format=oldhatlc.COL_FITS_TYPE[col],
+                array=np.array([caster(x) for x in lccols[col]])
+            )
+        )
+
+    hdulist = oldhatlc.pyfits.HDUList(
+        [oldhatlc.pyfits.PrimaryHDU(header=header),
+         oldhatlc.pyfits.BinTableHDU.from_columns(fitscols)]
+    )
+    hdulist.writeto(lcpath)
+
+
+
+def compress_lc(lcpath, compression):
+    '''
+    This writes a gzipped or bzipped copy of the LC at lcpath and returns its
+    path.
+
+    '''
+
+    opener = {'.gz':gzip.open, '.bz2':bz2.open}[compression]
+
+    with open(lcpath,'rb') as infd, opener(lcpath + compression,'wb') as outfd:
+        shutil.copyfileobj(infd, outfd)
+
+    return lcpath + compression
+
+
+
+def assert_lcdicts_equal(lcdict1, lcdict2):
+    '''
+    This checks that two LC dicts have the same keys, values, and dtypes.
+
+    '''
+
+    assert sorted(lcdict1.keys()) == sorted(lcdict2.keys())
+
+    for key in lcdict1:
+        if isinstance(lcdict1[key], np.ndarray):
+            assert lcdict1[key].dtype == lcdict2[key].dtype
+            assert np.array_equal(lcdict1[key], lcdict2[key])
+        else:
+            assert lcdict1[key] == lcdict2[key]
+
+
+
+###########
+## TESTS ##
+###########
+
+@pytest.mark.parametrize('lcname, expected', [
+    ('HAT-123-0001234-hatlc.csv', ('.csv', None)),
+    ('HAT-123-0001234-hatlc.csv.gz', ('.csv', '.gz')),
+    ('HAT-123-0001234-hatlc.hatlc.bz2', ('.hatlc', '.bz2')),
+    ('HAT-123-0001234-hatlc.fits', ('.fits', None)),
+    ('HAT-123-0001234-hatlc.fits.gz', ('.fits', '.gz')),
+    ('HAT-123-0001234-hatlc.sqlite.gz', (None, '.gz')),
+    ('HAT-123-0001234-hatlc.txt', (None, None)),
+    ('lcs.fits/HAT-123-0001234-hatlc.csv', ('.csv', None)),
+    (pathlib.Path('lcs/HAT-123-0001234-hatlc.csv.gz'), ('.csv', '.gz')),
+])
+def test_lc_format(lcname, expected):
+    '''
+    Tests working out the format and compression of LCs from their names.
+
+    '''
+
+    assert oldhatlc._lc_format(lcname) == expected
+
+
+
+@pytest.mark.parametrize('lcname', ['HAT-123-0001234-hatlc.csv',
+                                    'HAT-123-0001234-hatlc.hatlc'])
+def test_read_textlc(tmp_path, monkeypatch, lcname):
+    '''
+    Tests reading a text LC and its object info with np.loadtxt.
+
+    '''
+
+    monkeypatch.setattr(oldhatlc, 'HAVENUMBA', False)
+
+    lcpath = str(tmp_path / lcname)
+    lccols = make_textlc(lcpath)
+
+    lcdict = oldhatlc.read_hatlc(lcpath)
+
+    assert lcdict['hatid'] == 'HAT-123-0001234'
+    assert lcdict['twomassid'] == '01234567+0123456'
+    assert lcdict['ra'] == 12.34567
+    assert lcdict['dec'] == -23.45678
+    assert lcdict['mags'] == [12.1, 11.9, 11.7, 11.0, 10.8, 10.7]
+    assert lcdict['ndet'] == 200
+    assert lcdict['hatstations'] == ['5', '6', '8']
+    assert lcdict['filters'] == ['r - Sloan r']
+    assert lcdict['cols'] == LCCOLUMNS
+
+    for col in LCCOLUMNS:
+        if oldhatlc.COL_FITS_TYPE[col] != '1A':
+            caster = oldhatlc.COL_CASTER[col]
+            assert np.array_equal(lcdict[col],
+                                  np.array([caster(x) for x in lccols[col]]))
+
+
+
+def test_read_textlc_bad_header(tmp_path):
+    '''
+    Tests that a text LC header without the expected object info raises a
+    ValueError.
+
+    '''
+
+    lcpath = str(tmp_path / 'HAT-123-0001234-hatlc.csv')
+    make_textlc(lcpath)
+
+    with open(lcpath,'r') as infd:
+        lclines = [x for x in infd if not x.startswith('# Number of')]
+    with open(lcpath,'w') as outfd:
+        outfd.write(''.join(lclines))
+
+    with pytest.raises(ValueError, match='object info'):
+        oldhatlc.read_hatlc(lcpath)
+
+
+
+def test_read_textlc_column_descriptions(tmp_path):
+    '''
+    Tests that column descriptions containing ' - ' don't change the column
+    names read from the header.
+
+    '''
+
+    lcpath = str(tmp_path / 'HAT-123-0001234-hatlc.csv')
+    lccols = make_textlc(lcpath)
+
+    with open(lcpath,'r') as infd:
+        lctext = infd.read().replace(
+            '- IM1 - %s' % oldhatlc.COL_DESCRIPTION['IM1'],
+            '- IM1 - magnitude - aperture 1 - instrumental'
+        )
+    with open(lcpath,'w') as outfd:
+        outfd.write(lctext)
+
+    lcdict = oldhatlc.read_hatlc(lcpath)
+
+    assert lcdict['cols'] == LCCOLUMNS
+    assert np.array_equal(lcdict['IM1'],
+                          np.array([float(x) for x in lccols['IM1']]))
+
+
+
+@pytest.mark.skipif(not oldhatlc.HAVENUMBA, reason='numba not available')
+@pytest.mark.parametrize('lcname', ['HAT-123-0001234-hatlc.csv',
+                                    'HAT-123-0001234-hatlc.hatlc'])
+def test_numba_matches_loadtxt(tmp_path, monkeypatch, lcname):
+    '''
+    Tests that the numba parser gives the same LC dict as np.loadtxt.
+
+    '''
+
+    lcpath = str(tmp_path / lcname)
+    make_textlc(lcpath)
+
+    numbadict = oldhatlc.read_hatlc(lcpath)
+
+    monkeypatch.setattr(oldhatlc, 'HAVENUMBA', False)
+    loadtxtdict = oldhatlc.read_hatlc(lcpath)
+
+    assert_lcdicts_equal(numbadict, loadtxtdict)
+
+
+
+@pytest.mark.parametrize('havenumba', [True, False])
+def test_flag_columns(tmp_path, monkeypatch, havenumba):
+    '''
+    Tests that single-character flag columns are read as uint8 codes.
+
+    '''
+
+    monkeypatch.setattr(oldhatlc, 'HAVENUMBA',
+                        havenumba and oldhatlc.HAVENUMBA)
+
+    lcpath = str(tmp_path / 'HAT-123-0001234-hatlc.csv')
+    lccols = make_textlc(lcpath)
+
+    lcdict = oldhatlc.read_hatlc(lcpath)
+
+    for col in ('FLT', 'IQ1'):
+        assert lcdict[col].dtype == np.uint8
+        assert np.array_equal(lcdict[col],
+                              np.array([ord(x) for x in lccols[col]]))
+        assert np.array_equal(oldhatlc.flag_as_char(lcdict[col]),
+                              np.array(lccols[col], dtype='S1'))
+
+
+
+@pytest.mark.skipif(not oldhatlc.HAVENUMBA, reason='numba not available')
+def test_padded_fields(tmp_path, monkeypatch):
+    '''
+    Tests that the numba parser and np.loadtxt both strip the spaces around
+    padded CSV fields.
+
+    '''
+
+    lcpath = str(tmp_path / 'HAT-123-0001234-hatlc.csv')
+    lccols = make_textlc(lcpath, padded=True)
+
+    numbadict = oldhatlc.read_hatlc(lcpath)
+
+    monkeypatch.setattr(oldhatlc, 'HAVENUMBA', False)
+    loadtxtdict = oldhatlc.read_hatlc(lcpath)
+
+    assert_lcdicts_equal(numbadict, loadtxtdict)
+
+    assert np.array_equal(loadtxtdict['RSTF'], np.array(lccols['RSTF']))
+    assert np.array_equal(loadtxtdict['IQ1'],
+                          np.array([ord(x) for x in lccols['IQ1']]))
+
+
+
+@pytest.mark.parametrize('compression', ['.gz', '.bz2'])
+def test_python_decompressors(tmp_path, monkeypatch, compression):
+    '''
+    Tests that compressed LCs read through the buffered Python gzip and bz2
+    modules give the same LC dict as the uncompressed LC.
+
+    '''
+
+    monkeypatch.setattr(oldhatlc, 'HAVEISAL', False)
+    monkeypatch.setattr(oldhatlc, 'gzip', gzip)
+    monkeypatch.setattr(oldhatlc, 'ZCAT', None)
+    monkeypatch.setattr(oldhatlc, 'BZCAT', None)
+
+    lcpath = str(tmp_path / 'HAT-123-0001234-hatlc.csv')
+    make_textlc(lcpath)
+    compressed = compress_lc(lcpath, compression)
+
+    lcf, lcproc = oldhatlc._open_textlc(compressed, compression)
+    assert isinstance(lcf, io.BufferedReader)
+    assert lcproc is None
+    oldhatlc._close_textlc(lcf, lcproc)
+
+    assert_lcdicts_equal(oldhatlc.read_hatlc(compressed),
+                         oldhatlc.read_hatlc(lcpath))
+
+
+
+@pytest.mark.parametrize('compression', ['.gz', '.bz2'])
+def test_external_decompressors(tmp_path, monkeypatch, compression):
+    '''
+    Tests that compressed LCs piped through zcat or bzcat give the same LC
+    dict as the uncompressed LC, and that a failing decompressor falls back to
+    the Python one.
+
+    '''
+
+    extcmd = 'ZCAT' if compression == '.gz' else 'BZCAT'
+
+    if not shutil.which(extcmd.lower()):
+        pytest.skip('%s not available' % extcmd.lower())
+
+    monkeypatch.setattr(oldhatlc, 'HAVEISAL', False)
+    monkeypatch.setattr(oldhatlc, 'gzip', gzip)
+
+    lcpath = str(tmp_path / 'HAT-123-0001234-hatlc.csv')
+    make_textlc(lcpath)
+    compressed = compress_lc(lcpath, compression)
+
+    plaindict = oldhatlc.read_hatlc(lcpath)
+
+    monkeypatch.setattr(oldhatlc, extcmd, shutil.which(extcmd.lower()))
+    assert_lcdicts_equal(oldhatlc.read_hatlc(compressed), plaindict)
+
+    monkeypatch.setattr(oldhatlc, extcmd, shutil.which('false'))
+    assert_lcdicts_equal(oldhatlc.read_hatlc(compressed), plaindict)
+
+
+
+@pytest.mark.skipif(not shutil.which('zcat'), reason='zcat not available')
+def test_external_decompressor_cleanup(tmp_path, monkeypatch):
+    '''
+    Tests that zcat is waited on when reading an LC fails, and that an LC
+    without a header raises a ValueError.
+
+    '''
+
+    monkeypatch.setattr(oldhatlc, 'HAVEISAL', False)
+    monkeypatch.setattr(oldhatlc, 'ZCAT', shutil.which('zcat'))
+
+    lcprocs = []
+    popen = subprocess.Popen
+
+    def recording_popen(*args, **kwargs):
+        lcproc = popen(*args, **kwargs)
+        lcprocs.append(lcproc)
+        return lcproc
+
+    monkeypatch.setattr(oldhatlc.subprocess, 'Popen', recording_popen)
+
+    # a header that doesn't match TEXTLC_HEADER_RE, followed by enough rows
+    # that zcat is still writing when the header is rejected
+    lcpath = str(tmp_path / 'HAT-123-0001234-hatlc.csv')
+    make_textlc(lcpath, nrows=100000)
+    with open(lcpath,'r') as infd:
+        lclines = [x for x in infd if not x.startswith('# Number of')]
+    with open(lcpath,'w') as outfd:
+        outfd.write(''.join(lclines))
+
+    with pytest.raises(ValueError, match='object info'):
+        oldhatlc.read_hatlc(compress_lc(lcpath, '.gz'))
+
+    assert len(lcprocs) == 1
+    assert lcprocs[0].returncode is not None
+
+    # an LC without a header
+    nohdrpath = str(tmp_path / 'HAT-123-0001235-hatlc.csv')
+    with open(nohdrpath,'w') as outfd:
+        outfd.write('1.0,2.0,3.0\n')
+
+    with pytest.raises(ValueError, match='header'):
+        oldhatlc.read_hatlc(compress_lc(nohdrpath, '.gz'))
+
+    assert all(x.returncode is not None for x in lcprocs)
+
+
+
+def test_isal_decompressor(tmp_path, monkeypatch):
+    '''
+    Tests that gzipped LCs read with ISA-L's igzip give the same LC dict as
+    the uncompressed LC.
+
+    '''
+
+    igzip = pytest.importorskip('isal.igzip')
+
+    monkeypatch.setattr(oldhatlc, 'HAVEISAL', True)
+    monkeypatch.setattr(oldhatlc, 'gzip', igzip)
+
+    lcpath = str(tmp_path / 'HAT-123-0001234-hatlc.csv')
+    make_textlc(lcpath)
+    compressed = compress_lc(lcpath, '.gz')
+
+    lcf, lcproc = oldhatlc._open_textlc(compressed, '.gz')
+    assert lcproc is None
+    oldhatlc._close_textlc(lcf, lcproc)
+
+    assert_lcdicts_equal(oldhatlc.read_hatlc(compressed),
+                         oldhatlc.read_hatlc(lcpath))
+
+
+
+@pytest.mark.skipif(not oldhatlc.HAVEPYFITS, reason='pyfits not available')
+@pytest.mark.parametrize('lcname', ['HAT-123-0001234-hatlc.fits',
+                                    'HAT-123-0001234-hatlc.fits.gz'])
+def test_read_fitslc(tmp_path, lcname):
+    '''
+    Tests reading a plain and a gzipped FITS LC.
+
+    '''
+
+    textpath = str(tmp_path / 'HAT-123-0001234-hatlc.csv')
+    fitspath = str(tmp_path / lcname)
+
+    lccols = make_textlc(textpath)
+    make_fitslc(fitspath, lccols)
+
+    textdict = oldhatlc.read_hatlc(textpath)
+    fitsdict = oldhatlc.read_hatlc(fitspath)
+
+    assert fitsdict['hatid'] == textdict['hatid']
+    assert fitsdict['twomassid'] == textdict['twomassid']
+    assert fitsdict['ndet'] == textdict['ndet']
+    assert fitsdict['columns'] == LCCOLUMNS
+
+    # FITS LCs keep the narrower column types from COL_FITS_TYPE
+    for col in LCCOLUMNS:
+        assert np.array_equal(fitsdict[col],
+                              textdict[col].astype(fitsdict[col].dtype))
+
+
+
+def test_read_hatlcs(tmp_path):
+    '''
+    Tests reading many LCs in parallel, where one of them is missing.
+
+    '''
+
+    lcpaths = []
+
+    for ind in range(5):
+        lcpath = str(tmp_path / ('HAT-123-000%04d-hatlc.csv' % ind))
+        make_textlc(lcpath, seed=ind)
+        lcpaths.append(lcpath)
+
+    lcpaths.insert(2, str(tmp_path / 'HAT-123-0009999-hatlc.csv'))
+
+    lcdicts = list(oldhatlc.read_hatlcs(lcpaths, nworkers=2))
+
+    assert len(lcdicts) == 6
+    assert lcdicts[2] is None
+
+    for lcpath, lcdict in zip(lcpaths, lcdicts):
+        if lcdict is not None:
+            assert_lcdicts_equal(lcdict, oldhatlc.read_hatlc(lcpath))
+
+
+
+@pytest.mark.skipif(not oldhatlc.HAVEPYFITS, reason='pyfits not available')
+def test_read_fitslc_header(tmp_path):
+    '''
+    Tests reading the object info from the header of a FITS LC.
+
+    '''
+
+    fitspath = str(tmp_path / 'HAT-123-0001234-hatlc.fits')
+    make_fitslc(fitspath, make_textlc(str(tmp_path / 'lc.csv')))
+
+    lcdict = oldhatlc.read_hatlc(fitspath)
+
+    assert lcdict['hatid'] == 'HAT-123-0001234'
+    assert lcdict['twomassid'] == '01234567+0123456'
+    assert lcdict['ra'] == 12.34567
+    assert lcdict['dec'] == -23.45678
+    assert lcdict['mags'] == [12.1, 11.9, 11.7, 11.0, 10.8, 10.7]
+    assert lcdict['ndet'] == 200
+    assert lcdict['hatstations'] == '5, 6, 8'
+    assert lcdict['filters'] == 'r'
+
+
+
+@pytest.mark.skipif(not oldhatlc.HAVEPYFITS, reason='pyfits not available')
+@pytest.mark.skipif(not os.path.isdir('/proc/self/fd'),
+                    reason='needs /proc/self/fd to count open files')
+def test_read_fitslc_copy(tmp_path):
+    '''
+    Tests that FITS LC columns are copied by default, so the LC dicts don't
+    keep their FITS files open, and that copy=False returns views instead.
+
+    '''
+
+    fitspath = str(tmp_path / 'HAT-123-0001234-hatlc.fits')
+    make_fitslc(fitspath, make_textlc(str(tmp_path / 'lc.csv')))
+
+    nfds = len(os.listdir('/proc/self/fd'))
+
+    copydicts = [oldhatlc.read_hatlc(fitspath) for x in range(10)]
+
+    assert len(os.listdir('/proc/self/fd')) == nfds
+
+    for col in LCCOLUMNS:
+        assert copydicts[0][col].flags.writeable
+        assert copydicts[0][col].flags.c_contiguous
+
+    viewdict = oldhatlc.read_hatlc(fitspath, copy=False)
+
+    assert not viewdict['RJD'].flags.c_contiguous
+    assert np.array_equal(viewdict['RJD'], copydicts[0]['RJD'])
+
+
+
+@pytest.mark.skipif(not oldhatlc.HAVENUMBA, reason='numba not available')
+def test_atof():
+    '''
+    Tests the numba float parser against float(). The parser may refuse a
+    value it can't convert exactly, but any value it returns must match.
+
+    '''
+
+    rng = np.random.RandomState(42)
+
+    values = np.concatenate((
+        rng.normal(12.0,0.1,5000),
+        rng.uniform(0.0,1.0e6,5000),
+        10.0**rng.uniform(-30.0,30.0,5000),
+    ))
+    values[::2] = -values[::2]
+
+    teststrs = ['0', '-0', '0.0', '+1', '1.', '.5', '-.5', '1e5', '1E-5',
+                '2.5e+10', '56000.1234567', 'nan', 'NaN', 'inf', '-inf',
+                '12345678901234567890', '0.1234567890123456789',
+                '9007199254740993', '1e22', '1e23', '1e-22', '1e-23']
+
+    for val in values:
+        teststrs.extend(('%.5f' % val, '%.7f' % val, '%.17g' % val,
+                         '%.3e' % val, repr(val)))
+
+    nexact = 0
+
+    for teststr in teststrs:
+
+        buf = np.frombuffer(teststr.encode('ascii'), dtype=np.uint8)
+        val, ok = oldhatlc._atof(buf, 0, len(buf))
+
+        if ok:
+            nexact += 1
+            expected = float(teststr)
+            assert (val == expected or (np.isnan(val) and np.isnan(expected)))
+            assert np.signbit(val) == np.signbit(expected)
+
+    # the fixed-point values in LCs should all take the fast path
+    assert nexact > len(values)*2
+
+    for teststr in ['inf', '-INF', 'Infinity', '+infinity']:
+        buf = np.frombuffer(teststr.encode('ascii'), dtype=np.uint8)
+        assert oldhatlc._atof(buf, 0, len(buf)) == (float(teststr), True)
+
+    for badstr in ['', '-', '.', 'e5', '1e', '1.2.3', 'xx051.18', '12a',
+                   'infXXXXX', '-infjunk1', 'infinit', 'nanX']:
+        buf = np.frombuffer(badstr.encode('ascii'), dtype=np.uint8)
+        assert not oldhatlc._atof(buf, 0, len(buf))[1]
+
+
+
+@pytest.mark.skipif(not oldhatlc.HAVENUMBA, reason='numba not available')
+def test_atoi():
+    '''
+    Tests the numba int parser against int(), and that it refuses values
+    that might overflow an int64.
+
+    '''
+
+    for teststr in ['0', '-0', '+7', '123456', '-123456',
+                    '999999999999999999', '-999999999999999999']:
+        buf = np.frombuffer(teststr.encode('ascii'), dtype=np.uint8)
+        assert oldhatlc._atoi(buf, 0, len(buf)) == (int(teststr), True)
+
+    for badstr in ['', '-', '1.0', '12a', '9223372036854775808',
+                   '99999999999999999999', '-99999999999999999999']:
+        buf = np.frombuffer(badstr.encode('ascii'), dtype=np.uint8)
+        assert not oldhatlc._atoi(buf, 0, len(buf))[1]
+
+
+
+@pytest.mark.skipif(not oldhatlc.HAVENUMBA, reason='numba not available')
+def test_mmap_fallback_on_bad_row(tmp_path, monkeypatch):
+    '''
+    Tests that a memory-mapped LC with a bad row falls back to np.loadtxt and
+    raises its ValueError, instead of failing to close the mmap.
+
+    '''
+
+    monkeypatch.setattr(oldhatlc, 'MMAP_MIN_SIZE', 0)
+
+    lcpath = str(tmp_path / 'HAT-123-0001234-hatlc.csv')
+    make_textlc(lcpath, badrow=150)
+
+    with pytest.raises(ValueError, match='xx051.18'):
+        oldhatlc.read_hatlc(lcpath)
+
+    # a good LC should still go through the mmap path fine
+    lccols = make_textlc(lcpath)
+    lcdict = oldhatlc.read_hatlc(lcpath)
+
+    assert lcdict['ndet'] == 200
+    assert np.array_equal(lcdict['IM1'],
+                          np.array([float(x) for x in lccols['IM1']]))
+
+
+
+@pytest.mark.skipif(not oldhatlc.HAVEPYARROW, reason='pyarrow not available')
+def test_feathercache(tmp_path, monkeypatch):
+    '''
+    Tests that an LC read back from its Feather cache matches the original,
+    that its columns are writable, and that stale caches are ignored.
+
+    '''
+
+    lcpath = str(tmp_path / 'HAT-123-0001234-hatlc.csv')
+    make_textlc(lcpath)
+
+    lcdict = oldhatlc.read_hatlc(lcpath, feathercache=True)
+    cachedict = oldhatlc._read_feathercache(lcpath)
+
+    assert cachedict is not None
+    assert sorted(cachedict.keys()) == sorted(lcdict.keys())
+
+    for key in lcdict:
+        if isinstance(lcdict[key], np.ndarray):
+            assert cachedict[key].dtype == lcdict[key].dtype
+            assert np.array_equal(cachedict[key], lcdict[key])
+            assert cachedict[key].flags.writeable
+        else:
+            assert cachedict[key] == lcdict[key]
+
+    # caches written with another version of the cache layout are ignored
+    monkeypatch.setattr(oldhatlc, 'FEATHERCACHE_VERSION',
+                        oldhatlc.FEATHERCACHE_VERSION + 1)
+    assert oldhatlc._read_feathercache(lcpath) is None
+
+
+
+@pytest.mark.skipif(not oldhatlc.HAVEPYARROW, reason='pyarrow not available')
+def test_feathercache_corrupt(tmp_path):
+    '''
+    Tests that a corrupt Feather cache is ignored and rewritten, and that
+    caching works for LC paths given as pathlib.Path objects.
+
+    '''
+
+    lcpath = tmp_path / 'HAT-123-0001234-hatlc.csv'
+    make_textlc(str(lcpath))
+
+    lcdict = oldhatlc.read_hatlc(lcpath, feathercache=True)
+
+    with open(str(lcpath) + '.feather','wb') as outfd:
+        outfd.write(b'ARROW1')
+
+    assert_lcdicts_equal(oldhatlc.read_hatlc(lcpath, feathercache=True),
+                         lcdict)
+    assert_lcdicts_equal(oldhatlc._read_feathercache(str(lcpath)), lcdict)
+
+    # no temporary files should be left behind
+    assert sorted(x.name for x in tmp_path.iterdir()) == [
+        'HAT-123-0001234-hatlc.csv',
+        'HAT-123-0001234-hatlc.csv.feather',
+        'HAT-123-0001234-hatlc.csv.feather.json',
+    ]